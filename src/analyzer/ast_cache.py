@@ -0,0 +1,75 @@
+import os
+import pickle
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Optional
+
+
+# ===================== Path Config =====================
+ROOT = Path(__file__).resolve().parents[2]  # project root
+CACHE_PATH = ROOT / "data" / "intermediate" / "ast_cache.sqlite"
+
+# bump when the extraction rules change so stale entries are never replayed
+CACHE_VERSION = 3
+PY_VERSION = f"{sys.version_info[0]}.{sys.version_info[1]}"
+
+_conn: Optional[sqlite3.Connection] = None
+_conn_pid: Optional[int] = None
+
+
+# ===================== Helpers =====================
+def make_key(rel_path: str, content_hash: str) -> str:
+    # Example: oasislmf/utils/profiles.py:3f2a...:3.12:v1
+    return f"{rel_path}:{content_hash}:{PY_VERSION}:v{CACHE_VERSION}"
+
+
+def _connect() -> Optional[sqlite3.Connection]:
+    """One connection per process (sqlite connections must not cross a fork)."""
+    global _conn, _conn_pid
+    if _conn is not None and _conn_pid == os.getpid():
+        return _conn
+    try:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(CACHE_PATH), timeout=30)
+        # WAL + no fsync: entries are cheap to recompute, so durability is not worth a sync per file
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("CREATE TABLE IF NOT EXISTS ast_cache (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        conn.commit()
+    except sqlite3.Error:
+        return None
+    _conn, _conn_pid = conn, os.getpid()
+    return _conn
+
+
+# ===================== API =====================
+def load(key: str) -> Optional[list]:
+    """Return the cached node list for `key`, or None on miss (the cache is best-effort)."""
+    conn = _connect()
+    if conn is None:
+        return None
+    try:
+        row = conn.execute("SELECT value FROM ast_cache WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error:
+        return None
+    if row is None:
+        return None
+    try:
+        return pickle.loads(row[0])
+    except Exception:
+        return None
+
+
+def store(key: str, value: list) -> None:
+    conn = _connect()
+    if conn is None:
+        return
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO ast_cache (key, value) VALUES (?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+        )
+        conn.commit()
+    except sqlite3.Error:
+        pass
@@ -0,0 +1,382 @@
+import ast
+import hashlib
+import inspect
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from src.analyzer import ast_cache
+
+
+# ===================== Config =====================
+MAX_SNIPPET_LINES = 80
+
+# below this many files the process pool start-up costs more than it saves
+PARALLEL_MIN_FILES = 64
+PARALLEL_CHUNKSIZE = 32
+
+SKIP_DIR_KEYWORDS = ("venv", ".venv", "__pycache__", ".tox", "site-packages", "dist-packages")
+SKIP_FILE_KEYWORDS = ("test", "tests")
+
+# path keyword -> business stage, checked in priority order (first stage with any hit wins)
+STAGE_KEYWORDS = (
+    ("exposure", ("exposure", "oed", "location", "expos")),
+    ("hazard", ("hazard", "peril", "event", "occurrence")),
+    ("gul", ("gul", "loss", "groundup", "damage")),
+    ("fm", ("fm", "financial", "terms", "reinsurance", "profile")),
+    ("aggregation", ("aggregation", "aggre", "summary", "report", "reports")),
+)
+
+DOCSTRING_MARKER = '"""Docstring (excerpt)"""'
+
+
+def _alternation(keywords) -> str:
+    return "|".join(map(re.escape, keywords))
+
+
+SKIP_DIR_RE = re.compile(_alternation(SKIP_DIR_KEYWORDS))
+SKIP_FILE_RE = re.compile(_alternation(SKIP_DIR_KEYWORDS + SKIP_FILE_KEYWORDS))
+# one group per stage inside a lookahead, so finditer reports every (even overlapping) keyword hit
+STAGE_RE = re.compile("(?=" + "|".join(f"({_alternation(kws)})" for _, kws in STAGE_KEYWORDS) + ")")
+
+
+# ===================== Data Model =====================
+@dataclass(slots=True)
+class CodeItem:
+    rel_path: str
+    node_type: str            # "class" | "function"
+    name: str
+    lineno: int
+    end_lineno: int
+    docstring: str
+    snippet: str
+    business_stage: str       # exposure/hazard/gul/fm/aggregation/other
+
+
+# ===================== Helpers =====================
+def should_skip_dir(lower_name: str) -> bool:
+    # callers pass the already-lowercased name (the walker lowers each entry exactly once)
+    return SKIP_DIR_RE.search(lower_name) is not None
+
+
+def should_skip_file(lower_name: str) -> bool:
+    return SKIP_FILE_RE.search(lower_name) is not None
+
+
+def iter_py_files(root: Path) -> Iterator[Tuple[str, str]]:
+    """
+    Walk `root` with os.scandir and yield (path, lowercased repo-relative path) for every *.py file
+    that survives the skip filters. Skipped directories are pruned (never descended into);
+    hidden entries are ignored like glob's `**`.
+    Order matches glob's `**/*.py`: a directory's own files first, then its subdirectories
+    depth-first in listing order.
+    """
+    stack = [(str(root), "")]
+    while stack:
+        dir_path, lower_prefix = stack.pop()
+        try:
+            it = os.scandir(dir_path)
+        except OSError:
+            continue
+        subdirs = []
+        with it:
+            for e in it:
+                if e.name.startswith("."):
+                    continue
+                lower_name = e.name.lower()
+                if e.is_dir(follow_symlinks=False):
+                    if not should_skip_dir(lower_name):
+                        subdirs.append((e.path, f"{lower_prefix}{lower_name}/"))
+                elif e.name.endswith(".py") and e.is_file() and not should_skip_file(lower_name):
+                    yield e.path, f"{lower_prefix}{lower_name}"
+        # LIFO stack: push in reverse so the first listed subdirectory is visited next
+        stack.extend(reversed(subdirs))
+
+
+def safe_read_bytes(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except Exception:
+        return None
+
+
+def relative_path(path: str, repo_path: Path) -> str:
+    """Repo-relative, "/"-separated path; plain prefix slicing for paths produced by iter_py_files."""
+    root = os.path.join(str(repo_path), "")  # adds the trailing separator unless already present
+    if path.startswith(root):
+        rel = path[len(root):]
+    else:
+        rel = str(Path(path).relative_to(repo_path))
+    return rel if os.sep == "/" else rel.replace(os.sep, "/")
+
+
+def normalize_newlines(data: bytes) -> bytes:
+    # universal newlines, like read_text(): ast line numbers are counted on "\n" only
+    if b"\r" in data:
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    return data
+
+
+def decode_source(data: bytes) -> str:
+    # utf-8, dropping undecodable bytes instead of failing the whole file
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("utf-8", errors="ignore")
+
+
+def line_offsets(data: bytes) -> List[int]:
+    """Byte offset of the start of every line (computed once per file, shared by all snippets)."""
+    starts = [0]
+    i = data.find(b"\n")
+    while i != -1:
+        starts.append(i + 1)
+        i = data.find(b"\n", i + 1)
+    return starts
+
+
+def detect_stage(rel_path: str, lower_rel: Optional[str] = None) -> str:
+    """
+    Lightweight, explainable heuristic mapping file path -> business stage (see STAGE_KEYWORDS).
+    v0: good enough to support coverage stats; can be replaced by a richer catalog later.
+    Pass `lower_rel` when the lowercased path is already at hand (e.g. from iter_py_files).
+    """
+    if lower_rel is None:
+        lower_rel = rel_path.lower()
+    best = len(STAGE_KEYWORDS)
+    for m in STAGE_RE.finditer(lower_rel):
+        best = min(best, m.lastindex - 1)
+        if best == 0:
+            break
+    return STAGE_KEYWORDS[best][0] if best < len(STAGE_KEYWORDS) else "other"
+
+
+def extract_snippet(line_starts: List[int], data: bytes, lineno: int, end_lineno: int) -> str:
+    start = max(lineno - 1, 0)
+    end = min(end_lineno, start + MAX_SNIPPET_LINES)
+    lo = line_starts[start] if start < len(line_starts) else len(data)
+    hi = line_starts[end] if end < len(line_starts) else len(data)
+    # slices always start at a line boundary, so no multi-byte char is ever cut
+    return data[lo:hi].decode("utf-8", errors="ignore").rstrip()
+
+
+def _content_header(rel_path: str, node_type: str, name: str, lineno: int, end_lineno: int) -> str:
+    return (
+        f"# File: {rel_path}\n"
+        f"# {node_type}: {name} (lines {lineno}-{end_lineno})\n\n"
+    )
+
+
+def format_content(
+    rel_path: str,
+    node_type: str,
+    name: str,
+    lineno: int,
+    end_lineno: int,
+    snippet: str,
+    docstring: str,
+) -> str:
+    """Evidence text shared by catalog chunks and dataset contexts: header + snippet + docstring excerpt."""
+    return (
+        f"{_content_header(rel_path, node_type, name, lineno, end_lineno)}"
+        f"{snippet}\n\n"
+        f"{DOCSTRING_MARKER}\n{docstring}\n"
+    ).strip()
+
+
+def render_content(it: CodeItem) -> str:
+    return format_content(it.rel_path, it.node_type, it.name, it.lineno, it.end_lineno, it.snippet, it.docstring)
+
+
+def intern_fields(it: CodeItem) -> CodeItem:
+    """
+    Share one string object per distinct path / stage / type. Items unpickled from worker
+    processes or loaded from catalog.json otherwise carry a private copy of each.
+    """
+    it.rel_path = sys.intern(it.rel_path)
+    it.node_type = sys.intern(it.node_type)
+    it.business_stage = sys.intern(it.business_stage)
+    return it
+
+
+def code_item_from_chunk(c: dict) -> CodeItem:
+    """
+    Rehydrate a CodeItem from a catalog.json chunk.
+    The catalog only stores the rendered `content`, so the snippet is sliced back out of it.
+    """
+    it = intern_fields(CodeItem(
+        rel_path=c["path"],
+        node_type=c["symbol_type"],
+        name=c["name"],
+        lineno=c["lineno"],
+        end_lineno=c["end_lineno"],
+        docstring=c["docstring"],
+        snippet="",
+        business_stage=c["business_stage"],
+    ))
+    content = c.get("content", "")
+    header = _content_header(it.rel_path, it.node_type, it.name, it.lineno, it.end_lineno)
+    trailer = f"\n\n{DOCSTRING_MARKER}\n{it.docstring}"
+    if content.startswith(header) and content.endswith(trailer):
+        it.snippet = content[len(header):len(content) - len(trailer)]
+    else:
+        it.snippet = content
+    return it
+
+
+# ===================== Extractor =====================
+_BLOCK_FIELDS = ("body", "handlers", "orelse", "finalbody", "cases")
+
+
+def iter_defs(body: List[ast.stmt]) -> Iterator[ast.AST]:
+    """
+    Yield class/function defs in source order without walking expression subtrees.
+    Descends into class bodies and module-level blocks (if/try/with/...), never into function bodies.
+    """
+    # explicit stack of statement iterators: no per-level generator frames, source order preserved
+    stack = [iter(body)]
+    while stack:
+        for node in stack[-1]:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                yield node
+            elif isinstance(node, ast.ClassDef):
+                yield node
+                stack.append(iter(node.body))
+                break
+            else:
+                blocks = [b for b in (getattr(node, f, None) for f in _BLOCK_FIELDS) if b]
+                if blocks:
+                    stack.append(iter([n for b in blocks for n in b]))
+                    break
+        else:
+            stack.pop()
+
+
+def raw_docstring(node: ast.AST) -> Optional[str]:
+    # the Expr(Constant(str)) slot ast.get_docstring reads, without its cleandoc pass
+    body = node.body
+    if not body:
+        return None
+    first = body[0]
+    if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str):
+        return first.value.value
+    return None
+
+
+def _extract_defs(tree: ast.Module) -> List[Tuple[str, str, int, int, str]]:
+    """Public class/function defs with a meaningful docstring, as (name, node_type, lineno, end_lineno, docstring)."""
+    defs: List[Tuple[str, str, int, int, str]] = []
+    for node in iter_defs(tree.body):
+        if not isinstance(node, (ast.ClassDef, ast.FunctionDef)):
+            continue
+
+        name = node.name
+        if not name or name.startswith("_"):
+            continue
+
+        raw = raw_docstring(node)
+        # cleandoc only removes indentation, so a raw docstring that is already too short stays too short
+        if not raw or len(raw.strip()) < 10:
+            continue
+        doc = inspect.cleandoc(raw).strip()
+        if len(doc) < 10:
+            continue
+
+        lineno = node.lineno
+        end_lineno = node.end_lineno or lineno
+        node_type = "class" if isinstance(node, ast.ClassDef) else "function"
+        defs.append((name, node_type, lineno, end_lineno, doc))
+    return defs
+
+
+def parse_file(
+    path: str,
+    repo_path: Path,
+    lower_rel: Optional[str] = None,
+) -> Tuple[List[CodeItem], Optional[Tuple[str, str]]]:
+    """
+    Extract public class/function defs with a docstring from one file; returns (items, parse_error).
+    The def list is cached by content hash (see ast_cache), so unchanged files skip ast.parse on re-runs.
+    Module-level and picklable, so it can run in a worker process.
+    """
+    data = safe_read_bytes(path)
+    if data is None:
+        return [], (path, "read_failed")
+    # config modules / __init__ stubs without any def or class: nothing to extract, skip hash + parse
+    if b"def " not in data and b"class " not in data:
+        return [], None
+
+    rel_path = relative_path(path, repo_path)
+    key = ast_cache.make_key(rel_path, hashlib.sha1(data).hexdigest())
+    data = normalize_newlines(data)
+    defs = ast_cache.load(key)
+    if defs is None:
+        try:
+            tree = ast.parse(decode_source(data))
+        except Exception as e:
+            return [], (path, f"ast_parse_failed: {e}")
+        defs = _extract_defs(tree)
+        ast_cache.store(key, defs)
+
+    line_starts = line_offsets(data)
+    stage = detect_stage(rel_path, lower_rel)
+
+    items: List[CodeItem] = []
+    for name, node_type, lineno, end_lineno, doc in defs:
+        items.append(
+            CodeItem(
+                rel_path=rel_path,
+                node_type=node_type,
+                name=name,
+                lineno=lineno,
+                end_lineno=end_lineno,
+                docstring=doc,
+                snippet=extract_snippet(line_starts, data, lineno, end_lineno),
+                business_stage=stage,
+            )
+        )
+    return items, None
+
+
+def iter_code_items(
+    repo_path: Path,
+    files: Optional[Iterable[Tuple[str, str]]] = None,
+    parse_errors: Optional[List[Tuple[str, str]]] = None,
+    max_workers: Optional[int] = None,
+) -> Iterator[CodeItem]:
+    """
+    Single AST pass over the repo shared by the analyzer and the generator.
+    `files` are (path, lower_rel) pairs and default to iter_py_files(repo_path);
+    read/parse failures are appended to `parse_errors` if given.
+    Files are parsed in a process pool (`max_workers=None` lets ProcessPoolExecutor pick its default,
+    including the Windows cap of 61 workers); results keep file order.
+    """
+    files = list(iter_py_files(repo_path) if files is None else files)
+    paths = [f for f, _ in files]
+    lowers = [lr for _, lr in files]
+    # cpu_count only decides serial vs parallel; the pool itself gets the caller's max_workers
+    workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+
+    if workers > 1 and len(files) >= PARALLEL_MIN_FILES:
+        with ProcessPoolExecutor(max_workers=max_workers) as ex:
+            results = ex.map(parse_file, paths, repeat(repo_path), lowers, chunksize=PARALLEL_CHUNKSIZE)
+            yield from _collect(results, parse_errors)
+    else:
+        yield from _collect(map(parse_file, paths, repeat(repo_path), lowers), parse_errors)
+
+
+def _collect(
+    results: Iterable[Tuple[List[CodeItem], Optional[Tuple[str, str]]]],
+    parse_errors: Optional[List[Tuple[str, str]]],
+) -> Iterator[CodeItem]:
+    for items, err in results:
+        if err is not None and parse_errors is not None:
+            parse_errors.append(err)
+        for it in items:
+            yield intern_fields(it)
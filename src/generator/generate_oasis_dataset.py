@@ -1,86 +1,29 @@
 
 # coding: utf-8
 
-import ast
-import json
-import os
 import random
-from dataclasses import dataclass
-from glob import glob
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import List, Tuple
 
-from src.validator.sample_schema import TrainingSample
+import orjson
+
+from src.analyzer.extractor import CodeItem, code_item_from_chunk, iter_code_items, iter_py_files, render_content
+from src.validator.sample_schema import SAMPLE_ADAPTER
 
 # ============== 配置区（按你的目录结构） ==============
 ROOT = Path(__file__).resolve().parents[2]
 
 REPO_PATH = ROOT / "data" / "raw_repo"
+CATALOG_PATH = ROOT / "data" / "intermediate" / "catalog.json"   # build_catalog 的产物，存在则直接复用
 OUT_DIR = ROOT / "data" / "final_datasets"
 SEED = 42
 N_QA = 200
 N_DESIGN = 50
 
-MAX_SNIPPET_LINES = 80    # 单个 context 代码片段最大行数，避免太长
+WRITE_BUFFER_SIZE = 1 << 20
+WRITE_BATCH = 64
 # ====================================================
 
-SKIP_DIR_KEYWORDS = ("venv", ".venv", "__pycache__", ".tox", "site-packages", "dist-packages")
-SKIP_FILE_KEYWORDS = ("test", "tests")
-
-@dataclass
-class CodeItem:
-    rel_path: str
-    node_type: str               # "class" or "function"
-    name: str
-    lineno: int
-    end_lineno: int
-    docstring: str
-    snippet: str
-    business_stage: str
-
-def detect_stage(rel_path: str) -> str:
-    p = rel_path.lower()
-    # 轻量启发式：够用且可解释；后续可用 catalog 精化
-    if any(k in p for k in ("exposure", "location", "expos")):
-        return "exposure"
-    if any(k in p for k in ("hazard", "peril", "event", "occurrence")):
-        return "hazard"
-    if any(k in p for k in ("gul", "loss", "groundup")):
-        return "gul"
-    if any(k in p for k in ("fm", "financial", "terms", "reinsurance")):
-        return "fm"
-    if any(k in p for k in ("aggregation", "summary", "report")):
-        return "aggregation"
-    return "other"
-
-def should_skip_file(path: str) -> bool:
-    lp = path.lower()
-    if any(k in lp for k in SKIP_DIR_KEYWORDS):
-        return True
-    if any(k in os.path.basename(lp) for k in SKIP_FILE_KEYWORDS):
-        return True
-    return False
-
-def safe_read_text(fp: Path) -> Optional[str]:
-    try:
-        return fp.read_text(encoding="utf-8")
-    except UnicodeDecodeError:
-        # 兜底：忽略坏字符，保证 pipeline 不崩
-        try:
-            return fp.read_text(encoding="utf-8", errors="ignore")
-        except Exception:
-            return None
-    except Exception:
-        return None
-
-def extract_snippet(lines: List[str], lineno: int, end_lineno: int) -> str:
-    start = max(lineno - 1, 0)
-    end = min(end_lineno, len(lines))
-    # 控制最大行数，避免上下文过长
-    if end - start > MAX_SNIPPET_LINES:
-        end = start + MAX_SNIPPET_LINES
-    return "".join(lines[start:end]).rstrip()
-
 class CodeAnalyzer:
     def __init__(self, repo_path: Path):
         self.repo_path = repo_path
@@ -88,62 +31,63 @@ class CodeAnalyzer:
         self.parse_errors: List[Tuple[str, str]] = []
 
     def scan(self) -> None:
-        pattern = str(self.repo_path / "**" / "*.py")
-        files = glob(pattern, recursive=True)
-        files = [f for f in files if not should_skip_file(f)]
+        files = list(iter_py_files(self.repo_path))
 
         print(f"Scanning repo: {self.repo_path.resolve()}")
         print(f"Found {len(files)} python files (after filtering).")
 
-        for f in files:
-            self._parse_file(Path(f))
+        # 与 build_catalog 共用同一套抽取逻辑（src/analyzer/extractor.py）
+        self.items.extend(iter_code_items(self.repo_path, files, self.parse_errors))
 
         print(f"Extracted {len(self.items)} code items.")
         if self.parse_errors:
             print(f"Parse errors: {len(self.parse_errors)} (kept for debugging)")
 
-    def _parse_file(self, fp: Path) -> None:
-        content = safe_read_text(fp)
-        if content is None:
-            self.parse_errors.append((str(fp), "read_failed"))
-            return
-
-        try:
-            tree = ast.parse(content)
-        except Exception as e:
-            self.parse_errors.append((str(fp), f"ast_parse_failed: {e}"))
-            return
-
-        lines = content.splitlines(keepends=True)
-        rel_path = str(fp.relative_to(self.repo_path)).replace("\\", "/")
-
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.ClassDef, ast.FunctionDef)):
-                name = getattr(node, "name", "")
-                # 跳过私有 / 魔法
-                if not name or name.startswith("_"):
-                    continue
-
-                doc = ast.get_docstring(node)
-                # 没 docstring 的项噪音大：先不收（你后续可放宽）
-                if not doc or len(doc.strip()) < 10:
-                    continue
-
-                lineno = getattr(node, "lineno", 1)
-                end_lineno = getattr(node, "end_lineno", lineno)
-                snippet = extract_snippet(lines, lineno, end_lineno)
-
-                item = CodeItem(
-                    rel_path=rel_path,
-                    node_type="class" if isinstance(node, ast.ClassDef) else "function",
-                    name=name,
-                    lineno=lineno,
-                    end_lineno=end_lineno,
-                    docstring=doc.strip(),
-                    snippet=snippet,
-                    business_stage=detect_stage(rel_path),
-                )
-                self.items.append(item)
+def load_catalog_items(catalog_path: Path) -> List[CodeItem]:
+    # 复用 catalog.json 中的 chunk，避免对仓库再做一遍 AST 解析
+    chunks = orjson.loads(catalog_path.read_bytes())["chunks"]
+    return [code_item_from_chunk(c) for c in chunks]
+
+# 样本骨架中的常量部分：模块级预建一次，每条样本只 copy 后填入与 item 相关的字段
+# （business_stage / evidence_ref / intermediate_conclusion 先占位，保证输出字段顺序不变）
+_QA_META_TMPL = {
+    "repo": "OasisLMF",
+    "business_stage": "other",
+    "question_id": "AUTO_FACT",
+    "difficulty": "easy",
+    "language": "zh"
+}
+_QA_TRACE_TMPL = (
+    {"step": 1, "goal": "定位目标符号的定义与职责描述", "evidence_ref": None, "intermediate_conclusion": ""},
+    {"step": 2, "goal": "基于 docstring/实现总结其主要功能", "evidence_ref": None, "intermediate_conclusion": ""},
+)
+_DESIGN_META_TMPL = {
+    "repo": "OasisLMF",
+    "business_stage": "other",
+    "question_id": "AUTO_DESIGN",
+    "difficulty": "medium",
+    "language": "zh"
+}
+_DESIGN_TRACE_TMPL = (
+    {"step": 1, "goal": "确认当前组件职责与边界", "evidence_ref": None, "intermediate_conclusion": ""},
+    {
+        "step": 2,
+        "goal": "提出兼容性优先的扩展策略",
+        "evidence_ref": None,
+        "intermediate_conclusion": "通过适配层/解析函数新增支持，避免破坏现有契约与调用链。"
+    },
+)
+
+def _fill_trace(tmpl, rel_path: str, conclusions):
+    # conclusions[i] 为 None 时保留模板中的常量结论
+    trace = []
+    for step, conclusion in zip(tmpl, conclusions):
+        step = step.copy()
+        step["evidence_ref"] = [rel_path]
+        if conclusion is not None:
+            step["intermediate_conclusion"] = conclusion
+        trace.append(step)
+    return trace
 
 class DatasetGenerator:
     def __init__(self, items: List[CodeItem], seed: int = 42):
@@ -153,16 +97,10 @@ class DatasetGenerator:
     def _context_for_item(self, it: CodeItem):
         # 真正 repo-grounded：把“代码片段”作为 context
         # 同时把 docstring 拼进去，帮助模型理解职责
-        content = (
-            f"# File: {it.rel_path}\n"
-            f"# {it.node_type}: {it.name} (lines {it.lineno}-{it.end_lineno})\n\n"
-            f"{it.snippet}\n\n"
-            f'"""Docstring (excerpt)"""\n{it.docstring}\n'
-        )
         return [{
             "source_type": "code",
             "path": it.rel_path,
-            "content": content.strip()
+            "content": render_content(it)
         }]
 
     def create_fact_qa(self, it: CodeItem, idx: int):
@@ -175,20 +113,13 @@ class DatasetGenerator:
             f"证据：该定义出现在文件 `{it.rel_path}` 的第 {it.lineno} 行附近。"
         )
 
-        reasoning_trace = [
-            {
-                "step": 1,
-                "goal": "定位目标符号的定义与职责描述",
-                "evidence_ref": [it.rel_path],
-                "intermediate_conclusion": f"在 `{it.rel_path}` 中找到 `{it.name}` 的定义及 docstring。"
-            },
-            {
-                "step": 2,
-                "goal": "基于 docstring/实现总结其主要功能",
-                "evidence_ref": [it.rel_path],
-                "intermediate_conclusion": f"docstring 的首句可作为 `{it.name}` 职责的高置信摘要。"
-            }
-        ]
+        reasoning_trace = _fill_trace(_QA_TRACE_TMPL, it.rel_path, (
+            f"在 `{it.rel_path}` 中找到 `{it.name}` 的定义及 docstring。",
+            f"docstring 的首句可作为 `{it.name}` 职责的高置信摘要。",
+        ))
+
+        metadata = _QA_META_TMPL.copy()
+        metadata["business_stage"] = it.business_stage
 
         sample = {
             "id": f"qa_auto_{idx:04d}",
@@ -197,15 +128,8 @@ class DatasetGenerator:
             "context": self._context_for_item(it),
             "reasoning_trace": reasoning_trace,
             "output": output,
-            "metadata": {
-                "repo": "OasisLMF",
-                "business_stage": it.business_stage,
-                "question_id": "AUTO_FACT",
-                "difficulty": "easy",
-                "language": "zh"
-            }
+            "metadata": metadata
         }
-        TrainingSample.model_validate(sample)
         return sample
 
     def create_design(self, it: CodeItem, idx: int):
@@ -224,20 +148,13 @@ class DatasetGenerator:
             f"如存在调用链入口（CLI/管线），同步更新其输入校验与参数说明。\n"
         )
 
-        reasoning_trace = [
-            {
-                "step": 1,
-                "goal": "确认当前组件职责与边界",
-                "evidence_ref": [it.rel_path],
-                "intermediate_conclusion": f"`{it.name}` 在 `{it.rel_path}` 中承担特定处理职责，应在其边界内扩展。"
-            },
-            {
-                "step": 2,
-                "goal": "提出兼容性优先的扩展策略",
-                "evidence_ref": [it.rel_path],
-                "intermediate_conclusion": "通过适配层/解析函数新增支持，避免破坏现有契约与调用链。"
-            }
-        ]
+        reasoning_trace = _fill_trace(_DESIGN_TRACE_TMPL, it.rel_path, (
+            f"`{it.name}` 在 `{it.rel_path}` 中承担特定处理职责，应在其边界内扩展。",
+            None,
+        ))
+
+        metadata = _DESIGN_META_TMPL.copy()
+        metadata["business_stage"] = it.business_stage
 
         sample = {
             "id": f"design_auto_{idx:04d}",
@@ -246,30 +163,24 @@ class DatasetGenerator:
             "context": self._context_for_item(it),
             "reasoning_trace": reasoning_trace,
             "output": output,
-            "metadata": {
-                "repo": "OasisLMF",
-                "business_stage": it.business_stage,
-                "question_id": "AUTO_DESIGN",
-                "difficulty": "medium",
-                "language": "zh"
-            }
+            "metadata": metadata
         }
-        TrainingSample.model_validate(sample)
         return sample
 
     def generate(self, n_qa: int, n_design: int):
         # 基于 docstring 的项里再挑：QA 优先函数/类都可以；Design 优先 class
-        candidates = list(self.items)
-        self.rng.shuffle(candidates)
-
+        # random.sample 只抽取需要的 k 条，不对整个候选列表做 shuffle
+        candidates = self.items
         classes = [x for x in candidates if x.node_type == "class"]
-        funcs = [x for x in candidates if x.node_type == "function"]
 
-        qa_pool = candidates
-        design_pool = classes if len(classes) >= n_design else candidates
+        qa_pool = self.rng.sample(candidates, min(n_qa, len(candidates)))
+        if len(classes) >= n_design:
+            design_pool = self.rng.sample(classes, n_design)
+        else:
+            design_pool = self.rng.sample(candidates, min(n_design, len(candidates)))
 
-        qa_samples = [self.create_fact_qa(it, i+1) for i, it in enumerate(qa_pool[:n_qa])]
-        design_samples = [self.create_design(it, i+1) for i, it in enumerate(design_pool[:n_design])]
+        qa_samples = [self.create_fact_qa(it, i+1) for i, it in enumerate(qa_pool)]
+        design_samples = [self.create_design(it, i+1) for i, it in enumerate(design_pool)]
 
         return qa_samples + design_samples
 
@@ -286,28 +197,34 @@ def split_dataset(samples: List[dict], seed: int = 42):
 
 def write_jsonl(samples: List[dict], out_path: Path):
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    with out_path.open("w", encoding="utf-8") as f:
-        for s in samples:
-            f.write(json.dumps(s, ensure_ascii=False) + "\n")
+    # 1 MiB 缓冲 + 每 WRITE_BATCH 条样本拼成一次 write，减少系统调用
+    with out_path.open("wb", buffering=WRITE_BUFFER_SIZE) as f:
+        for i in range(0, len(samples), WRITE_BATCH):
+            batch = samples[i:i + WRITE_BATCH]
+            f.write(b"".join(orjson.dumps(s) + b"\n" for s in batch))
 
 def main():
-    if not REPO_PATH.exists():
-        raise FileNotFoundError(
-            f"Repo path not found: {REPO_PATH}. Please clone/unzip OasisLMF into data/raw_repo/."
-        )
-
-    analyzer = CodeAnalyzer(REPO_PATH)
-    analyzer.scan()
-
-    if not analyzer.items:
+    if CATALOG_PATH.exists():
+        items = load_catalog_items(CATALOG_PATH)
+        print(f"Loaded {len(items)} code items from catalog: {CATALOG_PATH.resolve()}")
+    else:
+        if not REPO_PATH.exists():
+            raise FileNotFoundError(
+                f"Repo path not found: {REPO_PATH}. Please clone/unzip OasisLMF into data/raw_repo/."
+            )
+        analyzer = CodeAnalyzer(REPO_PATH)
+        analyzer.scan()
+        items = analyzer.items
+
+    if not items:
         raise RuntimeError("No valid code items extracted. Check repo content or filters/docstrings.")
 
-    gen = DatasetGenerator(analyzer.items, seed=SEED)
+    gen = DatasetGenerator(items, seed=SEED)
     samples = gen.generate(N_QA, N_DESIGN)
 
-    # 再次全量校验（生成时已校验，这里作为最终保险）
+    # 全量校验：只在落盘前统一校验一次
     for s in samples:
-        TrainingSample.model_validate(s)
+        SAMPLE_ADAPTER.validate_python(s)
 
     train, dev, test = split_dataset(samples, seed=SEED)
 
@@ -2,7 +2,7 @@
 # coding: utf-8
 
 from typing import List, Literal
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 SourceType = Literal["doc", "code", "config"]
 TaskType = Literal["qa", "design"]
@@ -36,3 +36,6 @@ class TrainingSample(BaseModel):
     reasoning_trace: List[TraceStep]
     output: str
     metadata: Metadata
+
+# 预编译一次，生成/校验时复用（validate_python / validate_json）
+SAMPLE_ADAPTER = TypeAdapter(TrainingSample)
@@ -2,9 +2,8 @@
 # coding: utf-8
 
 import argparse
-import json
 from pathlib import Path
-from src.validator.sample_schema import TrainingSample
+from src.validator.sample_schema import SAMPLE_ADAPTER
 
 def validate_jsonl(path: str) -> None:
     p = Path(path)
@@ -13,16 +12,17 @@ def validate_jsonl(path: str) -> None:
 
     bad = 0
     total = 0
-    for i, line in enumerate(p.read_text(encoding="utf-8").splitlines(), start=1):
-        if not line.strip():
-            continue
-        total += 1
-        try:
-            obj = json.loads(line)
-            TrainingSample.model_validate(obj)
-        except Exception as e:
-            bad += 1
-            print(f"[Invalid] line {i}: {e}")
+    # 逐行流式读取（不整体读入内存）；bytes 直接交给 validate_json，省去解码
+    with p.open("rb") as f:
+        for i, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            total += 1
+            try:
+                SAMPLE_ADAPTER.validate_json(line)
+            except Exception as e:
+                bad += 1
+                print(f"[Invalid] line {i}: {e}")
 
     if bad == 0:
         print(f"✅ All samples are valid. total={total}")